@@ -1,12 +1,32 @@
+import logging
 import secrets
 from datetime import datetime, timedelta, timezone
 from fastapi import Response, HTTPException, status
 from jose import jwt, JWTError
+from sqlalchemy import text
 
 # Importamos las configuraciones de un lugar centralizado
 from config.settings import (
-    PRIVATE_KEY, PUBLIC_KEY, ALGORITHM, TOKEN_SECONDS_EXP, ENVIRONMENT, COOKIE_DOMAIN
+    PRIVATE_KEY, PUBLIC_KEY, ALGORITHM, TOKEN_SECONDS_EXP, REFRESH_TOKEN_SECONDS_EXP,
+    ENVIRONMENT, COOKIE_DOMAIN
 )
+from repositories.queries_repository import timed_session
+
+
+logger = logging.getLogger("app.auth")
+
+# Lista de revocación de refresh tokens en la tabla revoked_refresh_tokens
+# (ver scripts/install_token_revocation.py), compartida por todos los workers.
+# Los tokens ya expirados no hace falta recordarlos: la firma los rechaza
+_DELETE_EXPIRED = text("DELETE FROM revoked_refresh_tokens WHERE exp <= now()")
+_REVOKE = text(
+    "INSERT INTO revoked_refresh_tokens (jti, exp) VALUES (:jti, to_timestamp(:exp)) "
+    "ON CONFLICT (jti) DO NOTHING RETURNING jti"
+)
+
+# El refresh token solo viaja a los endpoints que lo usan (/auth/refresh y /auth/logout)
+REFRESH_COOKIE_PATH = "/auth"
+
 
 class JWTAuthHandler:
     is_production: bool
@@ -23,16 +43,64 @@ class JWTAuthHandler:
         to_encode.update({"exp": expire})
         return jwt.encode(to_encode, PRIVATE_KEY, algorithm=ALGORITHM)
 
+    def create_refresh_token(self, data: dict) -> str:
+        """Crea un refresh token JWT con un identificador único (jti) revocable."""
+        to_encode = data.copy()
+        expire = datetime.now(timezone.utc) + timedelta(seconds=REFRESH_TOKEN_SECONDS_EXP)
+        to_encode.update({"exp": expire, "type": "refresh", "jti": secrets.token_hex(16)})
+        return jwt.encode(to_encode, PRIVATE_KEY, algorithm=ALGORITHM)
+
     def decode_token(self, token: str) -> dict:
         try:
             payload = jwt.decode(token, PUBLIC_KEY, algorithms=[ALGORITHM])
-            return payload
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token inválido o expirado"
             )
 
+        # Un refresh token no sirve como token de acceso
+        if payload.get("type") == "refresh":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token inválido o expirado"
+            )
+        return payload
+
+    def decode_refresh_token(self, token: str) -> dict:
+        """Valida firma y tipo; la revocación se comprueba al revocarlo (revoke_refresh_token)."""
+        try:
+            payload = jwt.decode(token, PUBLIC_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token inválido o expirado"
+            )
+
+        if payload.get("type") != "refresh" or not payload.get("jti"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token inválido o expirado"
+            )
+        return payload
+
+    async def revoke_refresh_token(self, payload: dict) -> bool:
+        """
+        Revoca el refresh token. Comprobar y revocar es una sola sentencia, así que de dos
+        peticiones concurrentes con el mismo token solo una obtiene True.
+        Devuelve False si el token ya estaba revocado.
+        """
+        async with timed_session("revoke_refresh_token") as session:
+            await session.execute(_DELETE_EXPIRED)
+            result = await session.execute(_REVOKE, {"jti": payload["jti"], "exp": payload["exp"]})
+            revoked = result.scalar_one_or_none() is not None
+            await session.commit()
+
+        if not revoked:
+            # Reutilizar un token ya rotado puede indicar que fue robado
+            logger.warning("Intento de uso de un refresh token revocado", extra={"jti": payload["jti"]})
+        return revoked
+
     def set_auth_cookies(self, response: Response, user_data: dict):
         auth_token = self.create_access_token(user_data)
         
@@ -58,4 +126,23 @@ class JWTAuthHandler:
             max_age=TOKEN_SECONDS_EXP,
             domain=self.cookie_domain,
             path="/"
-        )
\ No newline at end of file
+        )
+
+    def set_refresh_cookie(self, response: Response, user_data: dict):
+        refresh_token = self.create_refresh_token(user_data)
+
+        response.set_cookie(
+            key="refresh_token",
+            value=refresh_token,
+            httponly=True,
+            secure=False,
+            samesite="lax",
+            max_age=REFRESH_TOKEN_SECONDS_EXP,
+            domain=self.cookie_domain,
+            path=REFRESH_COOKIE_PATH
+        )
+
+    def clear_auth_cookies(self, response: Response):
+        for key in ("access_token", "csrf_token"):
+            response.delete_cookie(key=key, domain=self.cookie_domain, path="/")
+        response.delete_cookie(key="refresh_token", domain=self.cookie_domain, path=REFRESH_COOKIE_PATH)
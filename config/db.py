@@ -1,9 +1,12 @@
+import logging
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import MetaData
 from config import settings
 
 
+logger = logging.getLogger("app.db")
+
 db_user = settings.USER
 db_password = settings.PASSWORD
 db_host = settings.HOST
@@ -13,7 +16,7 @@ db_name = settings.DATABASE
 
 DATABASE_URL_ASYNC = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
-async_engine = create_async_engine(DATABASE_URL_ASYNC, echo=True, pool_pre_ping=True, future=True)
+async_engine = create_async_engine(DATABASE_URL_ASYNC, echo=False, pool_pre_ping=True, future=True)
 
 async_session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -31,7 +34,7 @@ async def load_all_metadata():
         async with async_engine.connect() as conn:
             await conn.run_sync(cargar_metadata)
         _flags["is_loaded"] = True
-        print(f"Metadatos cargados con {len(metadata.tables)} tablas")
+        logger.info("Metadatos cargados con %d tablas", len(metadata.tables))
 
 
 
@@ -0,0 +1,135 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from config import settings
+
+
+# ID de la petición HTTP en curso; lo asigna el middleware de main.py
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Si se registra el SQL de la petición en curso. Se decide una vez por petición para
+# conservar o descartar todo su SQL (sentencias y parámetros) y no romper la correlación
+sql_sampled_var: ContextVar[bool] = ContextVar("sql_sampled", default=True)
+
+# Subsistema -> logger. SQLAlchemy escribe el SQL en "sqlalchemy.engine" (sin echo=True)
+SUBSYSTEM_LOGGERS = {
+    "sql": "sqlalchemy.engine",
+    "db": "app.db",
+    "repository": "app.repository",
+    "auth": "app.auth",
+}
+
+_STANDARD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "request_id"}
+
+_state = {"listener": None}
+
+
+
+class JSONFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON, incluyendo los campos de `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                data[key] = value
+
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+
+def sample_sql() -> bool:
+    """Decide si se registra el SQL de una nueva petición según LOG_SQL_SAMPLE_RATE."""
+    return random.random() < settings.LOG_SQL_SAMPLE_RATE
+
+
+
+class SQLSampleFilter(logging.Filter):
+    """Descarta el SQL de nivel INFO/DEBUG de las peticiones no muestreadas; avisos y errores siempre pasan."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.name.startswith(SUBSYSTEM_LOGGERS["sql"]) or record.levelno >= logging.WARNING:
+            return True
+        return sql_sampled_var.get()
+
+
+
+class _BackgroundQueueHandler(QueueHandler):
+    """
+    Encola el registro sin formatearlo: el JSON y la escritura en stdout
+    se hacen en el hilo del QueueListener, fuera del event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+
+def setup_logging():
+    """
+    Configura el logging estructurado (JSON) con un handler en segundo plano.
+    Es idempotente: llamadas posteriores no hacen nada.
+    """
+    if _state["listener"] is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    queue_handler = _BackgroundQueueHandler(log_queue)
+    # Los filtros corren antes de encolar: el request_id se lee en el contexto de la petición
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SQLSampleFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+
+    levels = {
+        "sql": settings.LOG_LEVEL_SQL,
+        "db": settings.LOG_LEVEL,
+        "repository": settings.LOG_LEVEL_REPOSITORY,
+        "auth": settings.LOG_LEVEL_AUTH,
+    }
+    for subsystem, logger_name in SUBSYSTEM_LOGGERS.items():
+        logging.getLogger(logger_name).setLevel(levels[subsystem])
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _state["listener"] = listener
@@ -32,6 +32,20 @@ with open(PUBLIC_KEY_PATH, "rb") as f:
 
 ALGORITHM = os.getenv("ALGORITHM")
 TOKEN_SECONDS_EXP = int(os.getenv("TOKEN_SECONDS_EXP"))
+REFRESH_TOKEN_SECONDS_EXP = int(os.getenv("REFRESH_TOKEN_SECONDS_EXP", 60 * 60 * 24 * 7))
 
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN")
+
+# Deadline por defecto (segundos) de las consultas del repositorio
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", "30"))
+# Espera máxima por un bloqueo; más corta que el deadline para fallar rápido ante bloqueos
+DB_LOCK_TIMEOUT = float(os.getenv("DB_LOCK_TIMEOUT", "2"))
+
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVEL_SQL = os.getenv("LOG_LEVEL_SQL", "WARNING").upper()
+LOG_LEVEL_REPOSITORY = os.getenv("LOG_LEVEL_REPOSITORY", LOG_LEVEL).upper()
+LOG_LEVEL_AUTH = os.getenv("LOG_LEVEL_AUTH", LOG_LEVEL).upper()
+LOG_SQL_SAMPLE_RATE = float(os.getenv("LOG_SQL_SAMPLE_RATE", "1.0"))
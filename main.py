@@ -1,11 +1,60 @@
-from fastapi import FastAPI
+import uuid
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from config.logger import setup_logging, request_id_var, sql_sampled_var, sample_sql
+from repositories.queries_repository import QueryTimeoutError
 from routers.login import login
 
+setup_logging()
+
 app = FastAPI()
 
 
+class RequestContextMiddleware:
+    """
+    Correlaciona todos los logs de la petición (incluido el SQL) con un mismo ID.
+
+    Middleware ASGI puro y no @app.middleware("http"): BaseHTTPMiddleware sustituye el
+    canal `receive`, así que las rutas no ven el http.disconnect del cliente y
+    cancel_on_disconnect nunca cancelaría la consulta.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("X-Request-ID") or uuid.uuid4().hex
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        sampled_token = sql_sampled_var.set(sample_sql())
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            sql_sampled_var.reset(sampled_token)
+            request_id_var.reset(token)
+
+
+app.add_middleware(RequestContextMiddleware)
+
+
+@app.exception_handler(QueryTimeoutError)
+async def query_timeout_handler(request: Request, exc: QueryTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
 app.include_router(login)
 
 
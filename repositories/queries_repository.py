@@ -1,13 +1,173 @@
-from sqlalchemy import select, insert, or_, and_, desc, asc, func
-from sqlalchemy.exc import IntegrityError
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import (
+    select, insert, or_, and_, desc, asc, func, distinct, literal_column, event, text,
+    PrimaryKeyConstraint, UniqueConstraint
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, DBAPIError
 from pydantic import BaseModel
-from typing import Dict, Any, Union, List
+from typing import Dict, Any, Union, List, Optional, Tuple
 
+from config import settings
 from config.db import async_session, get_table
 
 
+logger = logging.getLogger("app.repository")
 
-async def create(table_name: str, schema_or_dict:Union[BaseModel, dict]) -> Dict[str, Any]:
+
+class QueryTimeoutError(Exception):
+    """La consulta superó su deadline (statement_timeout, lock_timeout o el límite del cliente)."""
+
+
+
+# Deadline por defecto, en segundos, de cada función; las demás usan DB_STATEMENT_TIMEOUT
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "read": 5,
+    "read_paginated": 10,
+    "aggregate": 30,
+    "bulk_create": 60,
+    "bulk_upsert": 60,
+}
+
+# Margen para que Postgres cancele antes que el cliente y la conexión vuelva limpia al pool
+_CLIENT_GRACE_SECONDS = 1.0
+
+# query_canceled (statement_timeout) y lock_not_available (lock_timeout)
+_STATEMENT_TIMEOUT_SQLSTATE = "57014"
+_LOCK_TIMEOUT_SQLSTATE = "55P03"
+
+
+def _sqlstate(error: DBAPIError) -> Optional[str]:
+    orig = error.orig
+    return getattr(orig, "sqlstate", None) or getattr(getattr(orig, "__cause__", None), "sqlstate", None)
+
+
+@asynccontextmanager
+async def timed_session(function_name: str, timeout: Optional[float] = None):
+    """
+    Abre una sesión con un deadline para toda la llamada, no por sentencia.
+
+    Al empezar cada transacción se fijan statement_timeout (el tiempo que queda) y
+    lock_timeout (DB_LOCK_TIMEOUT) en una sola sentencia; solo las sentencias posteriores
+    de la misma llamada vuelven a fijar statement_timeout con lo que quede. Así Postgres
+    cancela antes que el cliente y la conexión vuelve limpia al pool.
+    Cualquier vencimiento se eleva como QueryTimeoutError indicando qué límite saltó.
+    """
+    seconds = timeout if timeout is not None else DEFAULT_TIMEOUTS.get(function_name, settings.DB_STATEMENT_TIMEOUT)
+    deadline = time.monotonic() + seconds
+    lock_milliseconds = max(1, int(settings.DB_LOCK_TIMEOUT * 1000))
+    deadline_message = f"La operación '{function_name}' superó el tiempo máximo de {seconds}s"
+    # La primera sentencia de cada transacción ya queda cubierta por after_begin
+    state = {"configured": False}
+
+    def remaining_milliseconds() -> int:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QueryTimeoutError(deadline_message)
+        return max(1, int(remaining * 1000))
+
+    def set_timeouts(session, transaction, connection):
+        connection.exec_driver_sql(
+            f"SELECT set_config('statement_timeout', '{remaining_milliseconds()}', true), "
+            f"set_config('lock_timeout', '{lock_milliseconds}', true)"
+        )
+        state["configured"] = True
+
+    def refresh_statement_timeout(orm_execute_state):
+        # connection() abre la transacción si hace falta, lo que dispara set_timeouts
+        connection = orm_execute_state.session.connection()
+        if state["configured"]:
+            state["configured"] = False
+            return
+        connection.exec_driver_sql(f"SELECT set_config('statement_timeout', '{remaining_milliseconds()}', true)")
+
+    def timeout_error(limit: str, message: str) -> QueryTimeoutError:
+        logger.warning("Deadline de %s agotado", function_name, extra={"timeout": seconds, "limit": limit})
+        return QueryTimeoutError(message)
+
+    try:
+        async with asyncio.timeout(seconds + _CLIENT_GRACE_SECONDS):
+            async with async_session() as session:
+                event.listen(session.sync_session, "after_begin", set_timeouts)
+                event.listen(session.sync_session, "do_orm_execute", refresh_statement_timeout)
+                yield session
+    except QueryTimeoutError:
+        # Presupuesto agotado antes de lanzar la siguiente sentencia
+        logger.warning("Deadline de %s agotado", function_name, extra={"timeout": seconds, "limit": "deadline"})
+        raise
+    except TimeoutError as e:
+        raise timeout_error("client", f"{deadline_message} (el cliente canceló la espera)") from e
+    except DBAPIError as e:
+        sqlstate = _sqlstate(e)
+        if sqlstate == _LOCK_TIMEOUT_SQLSTATE:
+            raise timeout_error(
+                "lock_timeout",
+                f"La operación '{function_name}' esperó un bloqueo más de {settings.DB_LOCK_TIMEOUT}s (lock_timeout)"
+            ) from e
+        if sqlstate == _STATEMENT_TIMEOUT_SQLSTATE:
+            raise timeout_error("statement_timeout", f"{deadline_message} (statement_timeout)") from e
+        raise
+
+
+
+async def get_table_version(table_name: str, timeout: Optional[float] = None) -> Optional[int]:
+    """
+    Versión de la tabla en `table_versions`, incrementada por un trigger en cada escritura
+    confirmada, venga de donde venga (ver scripts/install_table_versions.py).
+    Devuelve None si la tabla no está versionada; el versionado es opcional y solo se
+    instala en las tablas indicadas al script (nunca en tablas de ingesta).
+    """
+    query = text("SELECT version FROM table_versions WHERE table_name = :table_name")
+
+    async with timed_session("get_table_version", timeout) as session:
+        result = await session.execute(query, {"table_name": table_name})
+        return result.scalar_one_or_none()
+
+
+async def paginated_etag(
+    table_name: str,
+    filters: dict,
+    page: int = 1,
+    limit: int = 20,
+    operator: str = 'and',
+    order_by_column: str = 'id',
+    order_direction: str = 'asc'
+) -> Optional[str]:
+    """
+    Calcula el ETag de una consulta de read_paginated con una sola lectura por clave primaria.
+    Devuelve None si la tabla no está versionada: sin versión fiable no se puede responder 304.
+    """
+    version = await get_table_version(table_name)
+    if version is None:
+        return None
+
+    key = json.dumps(
+        [
+            table_name,
+            version,
+            filters or {},
+            page,
+            limit,
+            operator.lower(),
+            order_by_column,
+            order_direction.lower(),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+
+async def create(table_name: str, schema_or_dict:Union[BaseModel, dict], timeout: Optional[float] = None) -> Dict[str, Any]:
     """
     Inserta un registro usando metadata y esquema Pydantic
     """
@@ -24,7 +184,7 @@ async def create(table_name: str, schema_or_dict:Union[BaseModel, dict]) -> Dict
     # Crear la query de inserción
     stmt = table.insert().values(**values).returning(table)
     
-    async with async_session() as session:
+    async with timed_session("create", timeout) as session:
         result = await session.execute(stmt)
         new_record = result.fetchone()
         await session.commit()
@@ -34,13 +194,13 @@ async def create(table_name: str, schema_or_dict:Union[BaseModel, dict]) -> Dict
 
 
 
-async def bulk_create(table_name: str, schemas: List[BaseModel]):
+async def bulk_create(table_name: str, schemas: List[BaseModel], timeout: Optional[float] = None):
     try:
         table = await get_table(table_name)
         
         values_list = [schema.model_dump() for schema in schemas]
         
-        async with async_session() as session:
+        async with timed_session("bulk_create", timeout) as session:
             try:
                 await session.execute(
                     insert(table),
@@ -58,11 +218,10 @@ async def bulk_create(table_name: str, schemas: List[BaseModel]):
             except IntegrityError as e:
                 await session.rollback()
                 
-                error_message = str(e.orig)
+                duplicate = _parse_duplicate_error(str(e.orig))
                 
-                if "Duplicate entry" in error_message:
-                    column_name = error_message.split("key '")[1].split("'")[0].split('.')[-1]
-                    duplicate_value = error_message.split("Duplicate entry '")[1].split("'")[0]
+                if duplicate:
+                    column_name, duplicate_value = duplicate
                     
                     return {
                         "status": 400,
@@ -76,21 +235,39 @@ async def bulk_create(table_name: str, schemas: List[BaseModel]):
                     "error_code": "INTEGRITY_ERROR"
                 }
                 
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
     except Exception as e:
         return {
             "status": 500,
             "message": f"Error al crear registros en masa: {str(e)}"
         }
+
+
+
+def _parse_duplicate_error(error_message: str) -> Optional[Tuple[str, str]]:
+    """
+    Extrae (columna, valor) de un error de clave única de Postgres:
+    'duplicate key value violates unique constraint "..." DETAIL:  Key (email)=(a@b.com) already exists.'
+    """
+    match = re.search(r"Key \((.+?)\)=\((.*)\) already exists", error_message)
+    if not match:
+        return None
+    return match.group(1), match.group(2)
      
 
 
 
 
-async def create_multiple_atomic(table_schemas: Dict[str, List[Union[BaseModel, dict]]]):
+async def create_multiple_atomic(table_schemas: Dict[str, List[Union[BaseModel, dict]]], timeout: Optional[float] = None):
     results = {}
     total_records = 0
     
-    async with async_session() as session:
+    async with timed_session("create_multiple_atomic", timeout) as session:
         try:
             async with session.begin():
                 # Recorrer cada tabla y sus esquemas
@@ -173,7 +350,269 @@ async def create_multiple_atomic(table_schemas: Dict[str, List[Union[BaseModel,
 
 
 
-async def read(table_name: str, filter_column=None, filter_value=None):
+UPSERT_CHUNK_SIZE = 500
+
+
+def _resolve_conflict_target(table, conflict_target: Union[str, List[str]]) -> Tuple[List[str], Optional[str]]:
+    """
+    Devuelve las columnas del conflicto y, si el objetivo es una restricción con nombre,
+    ese nombre para usar ON CONFLICT ON CONSTRAINT.
+    """
+    if isinstance(conflict_target, str):
+        for constraint in table.constraints:
+            if constraint.name == conflict_target:
+                # ON CONFLICT solo admite restricciones de unicidad; una FK o un CHECK haría fallar la sentencia
+                if not isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint)):
+                    raise ValueError(
+                        f"La restricción '{conflict_target}' no es una clave primaria ni una restricción única."
+                    )
+                return [column.name for column in constraint.columns], conflict_target
+
+        # Un índice único no es una restricción: se usa como lista de columnas
+        for index in table.indexes:
+            if index.name == conflict_target and index.unique:
+                return [column.name for column in index.columns], None
+
+        raise ValueError(f"La restricción '{conflict_target}' no existe en la tabla '{table.name}'.")
+
+    if not conflict_target:
+        raise ValueError("Debe indicar al menos una columna de conflicto.")
+
+    return [_get_column(table, column).name for column in conflict_target], None
+
+
+
+def _upsert_statement(table, rows, conflict_columns, constraint_name, update_columns, do_nothing):
+    stmt = pg_insert(table).values(rows)
+
+    if constraint_name:
+        target = {"constraint": constraint_name}
+    else:
+        target = {"index_elements": conflict_columns}
+
+    if update_columns is None:
+        update_columns = [column for column in rows[0] if column not in conflict_columns]
+    else:
+        # Solo se actualizan columnas que vienen en los datos; el resto conserva su valor
+        update_columns = [column for column in update_columns if column in rows[0]]
+
+    if do_nothing or not update_columns:
+        return stmt.on_conflict_do_nothing(**target)
+
+    return stmt.on_conflict_do_update(**target, set_={column: stmt.excluded[column] for column in update_columns})
+
+
+
+def _upsert_batches(rows: List[Dict[str, Any]], conflict_columns: List[str], chunk_size: int, do_nothing: bool = False):
+    """
+    Agrupa las filas por conjunto de columnas y las divide en lotes de chunk_size.
+    Dentro de un lote, una clave de conflicto repetida hace fallar ON CONFLICT DO UPDATE,
+    así que solo se conserva una aparición: la última con DO UPDATE (gana la última escritura)
+    y la primera con DO NOTHING (como haría Postgres). Devuelve (lotes, filas descartadas).
+    """
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for values in rows:
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+
+    batches = []
+    discarded = 0
+    for group in groups.values():
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+
+            unique_rows: Dict[Any, Dict[str, Any]] = {}
+            for position, values in enumerate(chunk):
+                if all(values.get(column) is not None for column in conflict_columns):
+                    key = tuple(values[column] for column in conflict_columns)
+                    try:
+                        hash(key)
+                    except TypeError:
+                        raise ValueError(
+                            f"Las columnas de conflicto {conflict_columns} deben tener valores simples; "
+                            "no se admiten listas ni objetos JSON."
+                        )
+                else:
+                    # Con NULL en la clave no hay conflicto posible
+                    key = ("__sin_clave__", position)
+
+                if do_nothing:
+                    unique_rows.setdefault(key, values)
+                else:
+                    unique_rows.pop(key, None)
+                    unique_rows[key] = values
+
+            discarded += len(chunk) - len(unique_rows)
+            batches.append(list(unique_rows.values()))
+
+    return batches, discarded
+
+
+
+async def upsert(
+    table_name: str,
+    schema_or_dict: Union[BaseModel, dict],
+    conflict_target: Union[str, List[str]],
+    update_columns: Optional[List[str]] = None,
+    do_nothing: bool = False,
+    timeout: Optional[float] = None
+):
+    """
+    Inserta o actualiza un registro con un único INSERT ... ON CONFLICT.
+
+    - conflict_target: lista de columnas o nombre de la restricción única.
+    - update_columns: columnas a actualizar en conflicto (por defecto, todas las enviadas salvo las del conflicto).
+    - do_nothing: en conflicto no modifica nada y el registro cuenta como omitido.
+    """
+    try:
+        table = await get_table(table_name)
+
+        if isinstance(schema_or_dict, BaseModel):
+            values = schema_or_dict.model_dump(exclude_none=True)
+        elif isinstance(schema_or_dict, dict):
+            values = {k: v for k, v in schema_or_dict.items() if v is not None}
+        else:
+            raise ValueError("Los datos deben ser un BaseModel o un dict")
+
+        conflict_columns, constraint_name = _resolve_conflict_target(table, conflict_target)
+
+        stmt = _upsert_statement(table, [values], conflict_columns, constraint_name, update_columns, do_nothing)
+        # xmax = 0 solo en filas recién insertadas; en las actualizadas contiene el id de la transacción
+        stmt = stmt.returning(table, literal_column("xmax = 0").label("_inserted"))
+
+        async with timed_session("upsert", timeout) as session:
+            async with session.begin():
+                result = await session.execute(stmt)
+                row = result.mappings().first()
+
+        if row is None:
+            return {"status": 200, "data": None, "inserted": 0, "updated": 0, "skipped": 1}
+
+        data = {k: v for k, v in row.items() if k != "_inserted"}
+        return {
+            "status": 200,
+            "data": data,
+            "inserted": int(row["_inserted"]),
+            "updated": int(not row["_inserted"]),
+            "skipped": 0
+        }
+
+    except IntegrityError as e:
+        return {
+            "status": 400,
+            "message": f"Error de integridad en la base de datos: {str(e.orig)}",
+            "error_code": "INTEGRITY_ERROR"
+        }
+    except ValueError as e:
+        return {
+            "status": 400,
+            "message": str(e)
+        }
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
+    except Exception as e:
+        return {
+            "status": 500,
+            "message": f"Error al hacer upsert: {str(e)}"
+        }
+
+
+
+async def bulk_upsert(
+    table_name: str,
+    schemas_or_dicts: List[Union[BaseModel, dict]],
+    conflict_target: Union[str, List[str]],
+    update_columns: Optional[List[str]] = None,
+    do_nothing: bool = False,
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    timeout: Optional[float] = None
+):
+    """
+    Inserta o actualiza registros en masa con un INSERT ... ON CONFLICT por lote,
+    todo dentro de una transacción. Mismos parámetros que upsert, más chunk_size.
+    Devuelve cuántos registros se insertaron, actualizaron y omitieron.
+    """
+    try:
+        table = await get_table(table_name)
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size debe ser mayor que 0")
+
+        values_list = []
+        for schema_or_dict in schemas_or_dicts:
+            if isinstance(schema_or_dict, BaseModel):
+                values_list.append(schema_or_dict.model_dump(exclude_none=True))
+            elif isinstance(schema_or_dict, dict):
+                values_list.append({k: v for k, v in schema_or_dict.items() if v is not None})
+            else:
+                raise ValueError("Los datos deben ser un BaseModel o un dict")
+
+        conflict_columns, constraint_name = _resolve_conflict_target(table, conflict_target)
+        batches, skipped = _upsert_batches(values_list, conflict_columns, chunk_size, do_nothing)
+
+        inserted = 0
+        updated = 0
+
+        async with timed_session("bulk_upsert", timeout) as session:
+            async with session.begin():
+                for batch in batches:
+                    stmt = _upsert_statement(table, batch, conflict_columns, constraint_name, update_columns, do_nothing)
+                    stmt = stmt.returning(literal_column("xmax = 0").label("_inserted"))
+
+                    result = await session.execute(stmt)
+                    flags = result.scalars().all()
+
+                    inserted += sum(1 for flag in flags if flag)
+                    updated += sum(1 for flag in flags if not flag)
+                    # Las filas sin RETURNING son conflictos resueltos con DO NOTHING
+                    skipped += len(batch) - len(flags)
+
+        return {
+            "status": 200,
+            "inserted": inserted,
+            "updated": updated,
+            "skipped": skipped,
+            "message": f"Upsert completado: {inserted} insertados, {updated} actualizados, {skipped} omitidos"
+        }
+
+    except IntegrityError as e:
+        duplicate = _parse_duplicate_error(str(e.orig))
+        if duplicate:
+            column_name, duplicate_value = duplicate
+            return {
+                "status": 400,
+                "message": f"Ya existe un registro con valor '{duplicate_value}' para la columna '{column_name}'",
+                "error_code": "DUPLICATE_ENTRY"
+            }
+
+        return {
+            "status": 400,
+            "message": f"Error de integridad en la base de datos: {str(e.orig)}",
+            "error_code": "INTEGRITY_ERROR"
+        }
+    except ValueError as e:
+        return {
+            "status": 400,
+            "message": str(e)
+        }
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
+    except Exception as e:
+        return {
+            "status": 500,
+            "message": f"Error al hacer upsert en masa: {str(e)}"
+        }
+
+
+
+async def read(table_name: str, filter_column=None, filter_value=None, timeout: Optional[float] = None):
     table = await get_table(table_name)
     
     query = select(table)
@@ -182,53 +621,70 @@ async def read(table_name: str, filter_column=None, filter_value=None):
         query = query.where(getattr(table.c, filter_column) == filter_value)
 
     try:
-        async with async_session() as session:
+        async with timed_session("read", timeout) as session:
             async with session.begin():
                 result = await session.execute(query)
                 return result.mappings().all()
     except Exception as e:
         # Manejar cualquier error que pueda ocurrir
-        print(f"Error al leer de la base de datos: {e}")
+        logger.error("Error al leer de la base de datos: %s", e, extra={"table": table_name})
         raise
 
 
 
 
 
-async def read_paginated(
-    table_name: str,
-    filters: dict,
-    page: int = 1,
-    limit: int = 20,
-    operator: str = 'and',
-    order_by_column: str = 'id',  # Parámetro para ordenar, con un default común como 'id'
-    order_direction: str = 'asc'  # Parámetro opcional para la dirección
-):
+def _get_column(table, column_name: str):
+    if column_name not in table.c:
+        raise ValueError(f"La columna '{column_name}' no existe en la tabla '{table.name}'.")
+    return table.c[column_name]
+
+
+
+def _build_where_clause(table, filters: dict, operator: str = 'and'):
+    """
+    Construye el WHERE de los filtros: ILIKE '%valor%' para textos, igualdad para el resto.
+    Los valores None o '' se ignoran. Devuelve None si no hay condiciones.
+    """
     op_lower = operator.lower()
     if op_lower not in ['and', 'or']:
         raise ValueError("Operador no válido. Use 'and' o 'or'.")
 
-    table = await get_table(table_name)
-
     conditions = []
     if filters:
         for column, value in filters.items():
             if value is not None and value != '':
                 if isinstance(value, str):
-                    condition = getattr(table.c, column).ilike(f"%{value}%")
+                    condition = _get_column(table, column).ilike(f"%{value}%")
                 else:
-                    condition = getattr(table.c, column) == value
+                    condition = _get_column(table, column) == value
                 conditions.append(condition)
 
-    where_clause = None
-    if conditions:
-        if op_lower == 'or':
-            where_clause = or_(*conditions)
-        else:
-            where_clause = and_(*conditions)
+    if not conditions:
+        return None
+
+    if op_lower == 'or':
+        return or_(*conditions)
+    return and_(*conditions)
+
+
+
+async def read_paginated(
+    table_name: str,
+    filters: dict,
+    page: int = 1,
+    limit: int = 20,
+    operator: str = 'and',
+    order_by_column: str = 'id',  # Parámetro para ordenar, con un default común como 'id'
+    order_direction: str = 'asc',  # Parámetro opcional para la dirección
+    timeout: Optional[float] = None
+):
+    table = await get_table(table_name)
+
+    where_clause = _build_where_clause(table, filters, operator)
 
     try:
-        async with async_session() as session:
+        async with timed_session("read_paginated", timeout) as session:
             # ... (la consulta de conteo sigue igual) ...
             count_query = select(func.count()).select_from(table)
             if where_clause is not None:
@@ -267,12 +723,111 @@ async def read_paginated(
         # Capturamos el error si la columna de ordenamiento no existe
         raise ValueError(f"La columna de ordenamiento '{order_by_column}' no existe en la tabla '{table_name}'.")
     except Exception as e:
-        print(f"Error al buscar de forma paginada: {e}")
+        logger.error("Error al buscar de forma paginada: %s", e, extra={"table": table_name})
+        raise
+
+
+
+AGGREGATE_FUNCTIONS = {
+    "count": func.count,
+    "count_distinct": lambda column: func.count(distinct(column)),
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
+DATE_BUCKETS = ['minute', 'hour', 'day', 'week', 'month', 'quarter', 'year']
+
+# Funciones que solo tienen sentido sobre columnas numéricas o de intervalo
+NUMERIC_AGGREGATES = {"sum", "avg"}
+
+
+def _python_type(column) -> Optional[type]:
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _check_column_type(column, allowed: Tuple[type, ...], description: str):
+    python_type = _python_type(column)
+    # bool es subclase de int, pero sumar o promediar booleanos no es una métrica válida
+    if python_type is None or python_type is bool or not issubclass(python_type, allowed):
+        raise ValueError(f"La columna '{column.name}' ({column.type}) no es {description}.")
+
+
+async def aggregate(
+    table_name: str,
+    group_by: Optional[List[str]] = None,
+    metrics: Optional[Dict[str, Union[str, List[str]]]] = None,
+    filters: Optional[dict] = None,
+    operator: str = 'and',
+    date_column: Optional[str] = None,
+    date_bucket: Optional[str] = None,
+    timeout: Optional[float] = None
+):
+    """
+    Agrega en la base de datos con un único SELECT ... GROUP BY, validado contra la tabla reflejada.
+
+    - metrics: {"columna": "sum"} o {"columna": ["sum", "avg"]}. Cada métrica se devuelve
+      como "<funcion>_<columna>". {"*": "count"} cuenta filas y se devuelve como "count".
+      Por defecto se cuenta el número de filas.
+    - filters / operator: misma semántica que read_paginated.
+    - date_column / date_bucket: agrupa además por date_trunc(date_bucket, date_column),
+      devuelto como "<date_column>_<date_bucket>".
+    """
+    table = await get_table(table_name)
+
+    group_expressions = [_get_column(table, column) for column in group_by or []]
+
+    if date_bucket is not None or date_column is not None:
+        if date_bucket not in DATE_BUCKETS or date_column is None:
+            raise ValueError(f"Agrupación por fecha no válida. Indique date_column y un date_bucket entre {DATE_BUCKETS}.")
+        date_expression = _get_column(table, date_column)
+        _check_column_type(date_expression, (date,), "de tipo fecha o timestamp")
+        # Literal y no parámetro: con parámetros distintos en SELECT y GROUP BY, Postgres no los considera la misma expresión
+        bucket = func.date_trunc(literal_column(f"'{date_bucket}'"), date_expression).label(f"{date_column}_{date_bucket}")
+        group_expressions.append(bucket)
+
+    metric_expressions = []
+    for column, functions in (metrics or {"*": "count"}).items():
+        for function_name in ([functions] if isinstance(functions, str) else functions):
+            function_name = function_name.lower()
+            if function_name not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Función de agregación '{function_name}' no válida. Use una de {list(AGGREGATE_FUNCTIONS)}.")
+
+            if column == "*":
+                if function_name != "count":
+                    raise ValueError("La columna '*' solo admite la función 'count'.")
+                metric_expressions.append(func.count().label("count"))
+            else:
+                target = _get_column(table, column)
+                if function_name in NUMERIC_AGGREGATES:
+                    _check_column_type(target, (int, float, Decimal, timedelta), f"numérica ni de intervalo: '{function_name}' no se puede aplicar")
+                expression = AGGREGATE_FUNCTIONS[function_name](target)
+                metric_expressions.append(expression.label(f"{function_name}_{column}"))
+
+    query = select(*group_expressions, *metric_expressions).select_from(table)
+
+    where_clause = _build_where_clause(table, filters, operator)
+    if where_clause is not None:
+        query = query.where(where_clause)
+
+    if group_expressions:
+        query = query.group_by(*group_expressions).order_by(*group_expressions)
+
+    try:
+        async with timed_session("aggregate", timeout) as session:
+            result = await session.execute(query)
+            return result.mappings().all()
+    except Exception as e:
+        logger.error("Error al agregar: %s", e, extra={"table": table_name})
         raise
 
 
 
-async def update(table_name: str, schema_or_dict:Union[BaseModel, dict], filter_column: str): 
+async def update(table_name: str, schema_or_dict:Union[BaseModel, dict], filter_column: str, timeout: Optional[float] = None): 
     try:
         table = await get_table(table_name)        
 
@@ -293,7 +848,7 @@ async def update(table_name: str, schema_or_dict:Union[BaseModel, dict], filter_
         query = query.values(values)
 
 
-        async with async_session() as session:
+        async with timed_session("update", timeout) as session:
             async with session.begin():
                 result = await session.execute(query)
                 await session.commit()
@@ -309,6 +864,12 @@ async def update(table_name: str, schema_or_dict:Union[BaseModel, dict], filter_
             "message": "Actualización exitosa"
         }
     
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
     except Exception as e:
         return {
             "status": 500,
@@ -320,13 +881,14 @@ async def update(table_name: str, schema_or_dict:Union[BaseModel, dict], filter_
 
 
 async def update_multiple_atomic(
-    table_schemas: Dict[str, Dict[str, Union[str, List[Union[BaseModel, dict]]]]]
+    table_schemas: Dict[str, Dict[str, Union[str, List[Union[BaseModel, dict]]]]],
+    timeout: Optional[float] = None
 ):
     results = {}
     total_updates = 0
 
-    async with async_session() as session:
-        try:
+    try:
+        async with timed_session("update_multiple_atomic", timeout) as session:
             async with session.begin():
                 for table_name, config in table_schemas.items():
                     table = await get_table(table_name)
@@ -373,26 +935,32 @@ async def update_multiple_atomic(
                     "message": f"Se actualizaron {total_updates} registros exitosamente en {len(results)} tablas."
                 }
 
-        except (IntegrityError, ValueError) as e:
-            return {
-                "status": 400,
-                "message": f"Actualización fallida: {str(e)}"
-            }
-        except Exception as e:
-            return {
-                "status": 500,
-                "message": f"Error inesperado al actualizar múltiples registros: {str(e)}"
-            }
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
+    except (IntegrityError, ValueError) as e:
+        return {
+            "status": 400,
+            "message": f"Actualización fallida: {str(e)}"
+        }
+    except Exception as e:
+        return {
+            "status": 500,
+            "message": f"Error inesperado al actualizar múltiples registros: {str(e)}"
+        }
         
 
 
 
 
-async def delete(table_name: str, filter_column: str, filter_value):
+async def delete(table_name: str, filter_column: str, filter_value, timeout: Optional[float] = None):
     table = await get_table(table_name)
     
-    async with async_session() as session:
-        try:
+    try:
+        async with timed_session("delete", timeout) as session:
             async with session.begin():
                 # Primero verificamos si el registro existe
                 check_query = select(table).where(getattr(table.c, filter_column) == filter_value)
@@ -421,34 +989,39 @@ async def delete(table_name: str, filter_column: str, filter_value):
                     "message": f"Registro eliminado exitosamente. Filas afectadas: {rows_deleted}",
                     "rows_affected": rows_deleted
                 }
-        except Exception as e:
-            # Si ocurre cualquier error, hacemos rollback
-            await session.rollback()
+    except QueryTimeoutError as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
+    except Exception as e:
+        # El rollback lo hace session.begin() al salir con error
+        
+        # Determinar el tipo de error
+        if isinstance(e, IntegrityError):
+            error_message = str(e.orig)
             
-            # Determinar el tipo de error
-            if isinstance(e, IntegrityError):
-                error_message = str(e.orig)
-                
-                # Manejar error de restricción de clave foránea
-                if "foreign key constraint fails" in error_message.lower():
-                    return {
-                        "status": "error",
-                        "message": f"No se puede eliminar el registro porque está siendo referenciado por otros registros",
-                        "error_code": "FOREIGN_KEY_CONSTRAINT"
-                    }
-                
-            # Devolver error genérico
-            return {
-                "status": "error",
-                "message": f"Error al eliminar el registro: {str(e)}",
-                "error_code": "DELETE_ERROR"
-            }
+            # Manejar error de restricción de clave foránea
+            if "foreign key constraint fails" in error_message.lower():
+                return {
+                    "status": "error",
+                    "message": f"No se puede eliminar el registro porque está siendo referenciado por otros registros",
+                    "error_code": "FOREIGN_KEY_CONSTRAINT"
+                }
+            
+        # Devolver error genérico
+        return {
+            "status": "error",
+            "message": f"Error al eliminar el registro: {str(e)}",
+            "error_code": "DELETE_ERROR"
+        }
 
 
 
 
 
-async def use_function(function_name: str, *args: Any):
+async def use_function(function_name: str, *args: Any, timeout: Optional[float] = None):
     try:
         # Obtener la función dinámica desde func
         funcion_sql = getattr(func, function_name)
@@ -459,7 +1032,7 @@ async def use_function(function_name: str, *args: Any):
         # Armar el SELECT con los argumentos
         stmt = select(funcion_sql(*args))
 
-        async with async_session() as session:
+        async with timed_session("use_function", timeout) as session:
             result = await session.execute(stmt)
             return {
                 "status": 200,
@@ -472,6 +1045,13 @@ async def use_function(function_name: str, *args: Any):
             "message": f"La función '{function_name}' no es válida en SQLAlchemy.func"
         }
 
+    except QueryTimeoutError as e:
+        return {
+            "status": 504,
+            "message": str(e),
+            "error_code": "QUERY_TIMEOUT"
+        }
+
     except Exception as e:
         return {
             "status": 500,
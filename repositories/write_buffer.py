@@ -0,0 +1,244 @@
+import asyncio
+from pydantic import BaseModel
+from typing import Dict, Any, Union, List, Tuple, Optional
+
+from sqlalchemy import insert, select, values as values_clause, column, literal_column, func, Integer
+from sqlalchemy.exc import IntegrityError, DataError
+
+from config.db import get_table
+from repositories.queries_repository import timed_session
+
+
+
+class CreateBuffer:
+    """
+    Buffer de escritura diferida para inserciones individuales de alta frecuencia.
+
+    Agrupa los registros por tabla y los inserta con un único INSERT ... RETURNING
+    cuando se alcanza `max_batch_size` o pasan `max_delay` segundos desde el primer
+    registro pendiente. Cada llamada a `create` recibe su propio registro insertado
+    o su propio error. Si hay `max_pending` registros sin resolver, las nuevas
+    llamadas esperan (backpressure). `timeout` es el deadline de cada INSERT
+    (por defecto, el de `create` en el repositorio).
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 100,
+        max_delay: float = 0.05,
+        max_pending: int = 1000,
+        timeout: Optional[float] = None
+    ):
+        if max_batch_size < 1 or max_pending < 1:
+            raise ValueError("max_batch_size y max_pending deben ser mayores que 0")
+
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._flushes: set = set()
+        self._closed = False
+
+    async def create(self, table_name: str, schema_or_dict: Union[BaseModel, dict]) -> Dict[str, Any]:
+        """
+        Encola un registro y espera a que se inserte en el siguiente lote
+        """
+        if self._closed:
+            raise RuntimeError("El buffer de escritura está cerrado")
+
+        if isinstance(schema_or_dict, BaseModel):
+            values = schema_or_dict.model_dump(exclude_none=True)
+        elif isinstance(schema_or_dict, dict):
+            values = {k: v for k, v in schema_or_dict.items() if v is not None}
+        else:
+            raise ValueError("Los datos deben ser un BaseModel o un dict")
+
+        await self._slots.acquire()
+
+        # close() pudo llegar mientras se esperaba un hueco: el registro ya no se vaciaría
+        if self._closed:
+            self._slots.release()
+            raise RuntimeError("El buffer de escritura está cerrado")
+
+        future = asyncio.get_running_loop().create_future()
+        # El hueco se libera cuando el registro se resuelve, no cuando el llamador deja de esperar
+        future.add_done_callback(lambda _: self._slots.release())
+
+        batch = self._pending.setdefault(table_name, [])
+        batch.append((values, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._start_flush(table_name)
+        elif table_name not in self._timers:
+            self._timers[table_name] = asyncio.create_task(self._flush_after_delay(table_name))
+
+        # shield: si el llamador se cancela, el registro ya encolado se inserta igualmente
+        return await asyncio.shield(future)
+
+    async def flush(self):
+        """
+        Inserta inmediatamente todos los registros pendientes y espera a que terminen
+        """
+        for table_name in list(self._pending):
+            self._start_flush(table_name)
+
+        while self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def close(self):
+        """
+        Rechaza nuevas escrituras y vacía el buffer. Llamar al apagar la aplicación.
+        """
+        self._closed = True
+        await self.flush()
+
+
+
+    def _start_flush(self, table_name: str):
+        timer = self._timers.pop(table_name, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(table_name, [])
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._flush(table_name, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_after_delay(self, table_name: str):
+        await asyncio.sleep(self.max_delay)
+        # Se retira antes de vaciar para que _start_flush no se cancele a sí mismo
+        self._timers.pop(table_name, None)
+        self._start_flush(table_name)
+
+    async def _flush(self, table_name: str, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            table = await get_table(table_name)
+        except Exception as e:
+            for _, future in batch:
+                _reject(future, e)
+            return
+
+        # Un INSERT con varias filas exige las mismas columnas en todas ellas
+        groups: Dict[Tuple[str, ...], List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        for values, future in batch:
+            groups.setdefault(tuple(sorted(values)), []).append((values, future))
+
+        for group in groups.values():
+            stmt = _batch_insert_statement(table, list(group[0][0]), [values for values, _ in group])
+            if stmt is None:
+                # Sin una clave primaria calculable no hay forma fiable de emparejar filas y llamadores
+                for values, future in group:
+                    await self._insert_one(table_name, table, values, future)
+                continue
+
+            try:
+                async with timed_session("create", self.timeout) as session:
+                    result = await session.execute(stmt)
+                    rows = result.mappings().all()
+                    await session.commit()
+            except (IntegrityError, DataError):
+                # Un registro inválido no debe hacer fallar al resto del lote:
+                # se reintenta fila por fila para que cada llamador reciba su propio error
+                for values, future in group:
+                    await self._insert_one(table_name, table, values, future)
+                continue
+            except Exception as e:
+                # Timeouts, conexión o pool: reintentar fila por fila solo multiplicaría la espera
+                for _, future in group:
+                    _reject(future, e)
+                continue
+
+            records = {}
+            for row in rows:
+                record = dict(row)
+                records[record.pop(_ORDINAL)] = record
+
+            for position, (_, future) in enumerate(group):
+                if position in records:
+                    _resolve(future, records[position])
+                else:
+                    _reject(future, RuntimeError(f"La inserción en lote en '{table_name}' no devolvió el registro"))
+
+    async def _insert_one(self, table_name: str, table, values: Dict[str, Any], future: asyncio.Future):
+        try:
+            stmt = table.insert().values(**values).returning(table)
+
+            async with timed_session("create", self.timeout) as session:
+                result = await session.execute(stmt)
+                new_record = result.fetchone()
+                await session.commit()
+        except Exception as e:
+            _reject(future, e)
+            return
+
+        _resolve(future, dict(new_record._mapping))
+
+
+
+_ORDINAL = "_batch_ordinal"
+
+
+def _batch_insert_statement(table, columns: List[str], rows: List[Dict[str, Any]]):
+    """
+    Construye un único INSERT ... SELECT para todas las filas, o None si la tabla no lo permite.
+
+    Cada fila lleva su posición y su clave primaria se calcula (con el default de la columna)
+    antes de insertar; el SELECT final une lo insertado con esas posiciones por clave primaria,
+    así cada registro devuelto se asigna a su llamador sin depender del orden de RETURNING.
+    """
+    primary_key = list(table.primary_key.columns)
+    if len(primary_key) != 1:
+        return None
+    key = primary_key[0]
+
+    if key.name in columns:
+        key_expression = None
+    elif key.server_default is not None:
+        key_expression = literal_column(str(key.server_default.arg))
+    elif key.identity is not None and not key.identity.always:
+        key_expression = func.nextval(func.pg_get_serial_sequence(f'"{table.name}"', key.name))
+    else:
+        return None
+
+    data = values_clause(
+        column(_ORDINAL, Integer),
+        *[column(name, table.c[name].type) for name in columns],
+        name="batch_values"
+    ).data([(position, *[values[name] for name in columns]) for position, values in enumerate(rows)])
+
+    if key_expression is None:
+        numbered = select(data)
+        insert_columns = columns
+    else:
+        numbered = select(data, key_expression.label(key.name))
+        insert_columns = columns + [key.name]
+
+    # MATERIALIZED: la clave se calcula una sola vez aunque el CTE se lea dos veces
+    numbered = numbered.cte("numbered").prefix_with("MATERIALIZED")
+
+    inserted = (
+        insert(table)
+        .from_select(insert_columns, select(*[numbered.c[name] for name in insert_columns]))
+        .returning(*table.c)
+        .cte("inserted")
+    )
+
+    return select(numbered.c[_ORDINAL], *inserted.c).join_from(
+        inserted, numbered, inserted.c[key.name] == numbered.c[key.name]
+    )
+
+
+
+def _resolve(future: asyncio.Future, record: Dict[str, Any]):
+    if not future.done():
+        future.set_result(record)
+
+
+def _reject(future: asyncio.Future, error: Exception):
+    if not future.done():
+        future.set_exception(error)
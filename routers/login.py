@@ -1,4 +1,5 @@
-from fastapi import Depends, APIRouter, HTTPException 
+import logging
+from fastapi import Depends, APIRouter, HTTPException, Cookie
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -7,6 +8,8 @@ from argon2 import PasswordHasher
 from repositories.queries_repository import read
 from auth.handler import JWTAuthHandler
 
+logger = logging.getLogger("app.auth")
+
 jwt_handler = JWTAuthHandler()
 ph = PasswordHasher()
 
@@ -17,17 +20,57 @@ async def login_auth2(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await read("users", "email", form_data.username)
 
     if not user or not user[0].email or not user[0].password:
+        logger.info("Inicio de sesión fallido: usuario inexistente")
         raise HTTPException(status_code=400, detail="Nombre de usuario o contraseña incorrectos")
 
     try:
         if not ph.verify(user[0].password, form_data.password):
             raise HTTPException(status_code=400, detail="Nombre de usuario o contraseña incorrectos")
     except Exception:
+        logger.info("Inicio de sesión fallido: contraseña incorrecta")
         raise HTTPException(status_code=400, detail="Nombre de usuario o contraseña incorrectos")
 
     datos = {"email": user[0].email}
     response = JSONResponse(content={"message": "Inicio de sesión exitoso", "user": datos}, status_code=200)
 
     jwt_handler.set_auth_cookies(response, datos)
+    jwt_handler.set_refresh_cookie(response, datos)
+
+    return response
+
+
+
+@login.post("/auth/refresh", tags=["Login"])
+async def refresh_tokens(refresh_token: str = Cookie(None)):
+    # Solo firma y lista de revocación: sin Argon2 ni consulta a la tabla de usuarios
+    if refresh_token is None:
+        raise HTTPException(status_code=401, detail="Cookie 'refresh_token' no encontrada")
+
+    payload = jwt_handler.decode_refresh_token(refresh_token)
+
+    # Rotación: el refresh token usado queda revocado y se emite uno nuevo
+    if not await jwt_handler.revoke_refresh_token(payload):
+        raise HTTPException(status_code=401, detail="Refresh token inválido o expirado")
+
+    datos = {"email": payload["email"]}
+    response = JSONResponse(content={"message": "Sesión renovada", "user": datos}, status_code=200)
+
+    jwt_handler.set_auth_cookies(response, datos)
+    jwt_handler.set_refresh_cookie(response, datos)
+
+    return response
+
+
+
+@login.post("/auth/logout", tags=["Login"])
+async def logout(refresh_token: str = Cookie(None)):
+    if refresh_token is not None:
+        try:
+            await jwt_handler.revoke_refresh_token(jwt_handler.decode_refresh_token(refresh_token))
+        except HTTPException:
+            pass
+
+    response = JSONResponse(content={"message": "Sesión cerrada"}, status_code=200)
+    jwt_handler.clear_auth_cookies(response)
 
     return response
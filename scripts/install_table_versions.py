@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import sys
+from typing import List
+
+from sqlalchemy import text
+
+from config.db import async_engine
+from config.logger import setup_logging
+
+
+logger = logging.getLogger("app.db")
+
+
+# --- 1. SQL ---
+# Una fila por tabla en table_versions; un trigger por sentencia la incrementa dentro de la
+# misma transacción que la escritura, así que la versión cambia justo cuando los datos son
+# visibles, sin importar si la escritura viene del repositorio, de otro worker o de SQL manual.
+#
+# El versionado es opcional y por tabla: la fila de versión queda bloqueada hasta el commit,
+# así que todas las escrituras a una tabla versionada se serializan en ella. Solo deben
+# versionarse las tablas de lectura frecuente y escritura poco frecuente que se consultan con
+# ETag. Las tablas de ingesta (p. ej. las que usan CreateBuffer) NO deben versionarse.
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name text PRIMARY KEY,
+    version bigint NOT NULL
+)
+"""
+
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+FIND_TABLES = """
+SELECT tablename, quote_ident(tablename) FROM pg_tables
+WHERE schemaname = current_schema() AND tablename = ANY(:table_names)
+"""
+
+FIND_VERSIONED_TABLES = """
+SELECT c.relname, quote_ident(c.relname) FROM pg_trigger t
+JOIN pg_class c ON c.oid = t.tgrelid
+WHERE t.tgname = 'trg_table_version' AND c.relnamespace = current_schema()::regnamespace
+"""
+
+# La versión inicial parte del reloj para que reinstalar no repita versiones (y ETags) ya emitidos
+INSERT_VERSION = """
+INSERT INTO table_versions (table_name, version)
+VALUES (:table_name, (extract(epoch FROM clock_timestamp()) * 1000)::bigint)
+ON CONFLICT (table_name) DO NOTHING
+"""
+
+# --- 2. Función Principal ---
+async def install_table_versions(table_names: List[str]):
+    """
+    Versiona exactamente las tablas indicadas: instala el trigger en ellas y lo retira
+    (junto con su fila de versión) de cualquier otra tabla que lo tuviera.
+    """
+    async with async_engine.begin() as conn:
+        await conn.execute(text(CREATE_TABLE))
+        await conn.execute(text(CREATE_FUNCTION))
+
+        found = dict((await conn.execute(text(FIND_TABLES), {"table_names": table_names})).all())
+        missing = sorted(set(table_names) - set(found))
+        if missing:
+            raise ValueError(f"Tablas no encontradas: {', '.join(missing)}")
+
+        versioned = dict((await conn.execute(text(FIND_VERSIONED_TABLES))).all())
+        for table_name, quoted in versioned.items():
+            if table_name not in found:
+                await conn.execute(text(f"DROP TRIGGER trg_table_version ON {quoted}"))
+                await conn.execute(text("DELETE FROM table_versions WHERE table_name = :table_name"), {"table_name": table_name})
+                logger.info("Versionado retirado de %s", table_name)
+
+        for table_name, quoted in found.items():
+            await conn.execute(text(INSERT_VERSION), {"table_name": table_name})
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS trg_table_version ON {quoted}"))
+            await conn.execute(text(
+                f"CREATE TRIGGER trg_table_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {quoted} "
+                "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+            ))
+            logger.info("Versionado instalado en %s", table_name)
+
+# --- 3. Ejecución del Script ---
+if __name__ == "__main__":
+    # Uso: python -m scripts.install_table_versions tabla1 tabla2 ...
+    # La lista es completa: las tablas versionadas que no aparezcan dejan de estarlo.
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python -m scripts.install_table_versions <tabla> [<tabla> ...]")
+
+    setup_logging()
+    asyncio.run(install_table_versions(sys.argv[1:]))
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from config.db import async_engine
+from config.logger import setup_logging
+
+
+logger = logging.getLogger("app.db")
+
+
+# --- 1. SQL ---
+# Lista de revocación de refresh tokens compartida por todos los workers.
+# Solo guarda tokens aún vigentes: revoke_refresh_token borra los expirados usando el índice por exp.
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS revoked_refresh_tokens (
+    jti text PRIMARY KEY,
+    exp timestamptz NOT NULL
+)
+"""
+
+CREATE_INDEX = """
+CREATE INDEX IF NOT EXISTS revoked_refresh_tokens_exp_idx ON revoked_refresh_tokens (exp)
+"""
+
+# --- 2. Función Principal ---
+async def install_token_revocation():
+    async with async_engine.begin() as conn:
+        await conn.execute(text(CREATE_TABLE))
+        await conn.execute(text(CREATE_INDEX))
+
+    logger.info("Tabla revoked_refresh_tokens instalada")
+
+# --- 3. Ejecución del Script ---
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(install_token_revocation())
@@ -1,14 +1,18 @@
 import asyncio
+import logging
 import random
 import string
+import sys
 
 from argon2 import PasswordHasher
 
+from config.logger import setup_logging
 from repositories.queries_repository import create
 from schemes.user import UserCreate
 
 
 # --- 1. Preparación ---
+logger = logging.getLogger("app.seed")
 ph = PasswordHasher()
 
 def generate_random_string(length=12):
@@ -17,18 +21,19 @@ def generate_random_string(length=12):
 
 # --- 2. Función Principal ---
 async def create_and_save_test_user():
-    print("🚀 Iniciando la creación de un usuario de prueba...")
+    logger.info("Iniciando la creación de un usuario de prueba")
 
     # Generamos un correo y contraseña aleatorios
     test_email = f"user_{generate_random_string(6).lower()}@test.com"
     test_password = generate_random_string(16) # Contraseña segura de 16 caracteres
     
-    print(f"   - Email generado: {test_email}")
-    print(f"   - Contraseña generada: {test_password}")
+    logger.info("Credenciales generadas", extra={"email": test_email})
+    # La contraseña solo se muestra en la terminal del operador, nunca en los logs
+    print(f"Contraseña generada: {test_password}", file=sys.stderr)
 
     # Hasheamos la contraseña
     hashed_password = ph.hash(test_password)
-    print("   - Contraseña hasheada con Argon2.")
+    logger.info("Contraseña hasheada con Argon2")
 
     # Creamos el objeto de usuario usando el esquema Pydantic
     user_data = UserCreate(
@@ -39,13 +44,12 @@ async def create_and_save_test_user():
     # --- 3. Guardado en la Base de Datos ---
     try:
         new_user = await create("users", user_data)
-        print("-" * 30)
-        print(f"✅ ¡Éxito! Usuario creado con ID: {new_user['id']} y Email: {new_user['email']}")
-        print("-" * 30)
-    except Exception as e:
-        print(f"❌ Error al guardar en la base de datos: {e}")
+        logger.info("Usuario creado", extra={"id": new_user['id'], "email": new_user['email']})
+    except Exception:
+        logger.exception("Error al guardar en la base de datos")
 
 # --- 4. Ejecución del Script ---
 if __name__ == "__main__":
+    setup_logging()
     # Ejecutamos la función asíncrona
     asyncio.run(create_and_save_test_user())
\ No newline at end of file
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+
+# Las pruebas usan una base de datos Postgres real configurada con las mismas variables
+# de entorno que la aplicación (.env). Sin configuración no hay nada que probar.
+try:
+    from config.db import async_engine, metadata, _flags
+except (ImportError, EnvironmentError, TypeError):
+    collect_ignore_glob = ["test_*.py"]
+else:
+    from sqlalchemy import event, text
+
+
+    def run(coro):
+        """Ejecuta la corrutina y cierra el pool en el mismo loop (asyncpg no admite cambiar de loop)."""
+        async def runner():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(runner())
+
+
+    async def execute_sql(*statements: str):
+        async with async_engine.begin() as conn:
+            for statement in statements:
+                await conn.execute(text(statement))
+
+        # Volver a reflejar en la próxima llamada al repositorio
+        metadata.clear()
+        _flags["is_loaded"] = False
+
+
+    @pytest.fixture
+    def sql():
+        """Ejecuta SQL de preparación y limpieza: sql(*sentencias)."""
+        return lambda *statements: run(execute_sql(*statements))
+
+
+    @pytest.fixture
+    def statements():
+        """Lista con el SQL enviado a Postgres durante la prueba."""
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        yield executed
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Request
+from sqlalchemy import text
+
+from config.db import async_engine
+from main import app
+from repositories.queries_repository import use_function
+from utils.disconnect_utils import cancel_on_disconnect
+from tests.conftest import run
+
+
+@pytest.fixture
+def slow_route():
+    async def slow(request: Request):
+        return await cancel_on_disconnect(request, use_function("pg_sleep", 5), poll_interval=0.05)
+
+    app.router.add_api_route("/_test/slow", slow)
+    yield "/_test/slow"
+    app.router.routes.pop()
+
+
+async def _running_sleeps() -> int:
+    async with async_engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE state = 'active' AND query LIKE '%pg_sleep%' AND pid <> pg_backend_pid()"
+        ))
+        return result.scalar_one()
+
+
+def test_client_disconnect_cancels_the_query(slow_route):
+    async def scenario():
+        disconnected = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": slow_route, "raw_path": slow_route.encode(), "root_path": "",
+            "query_string": b"", "headers": [(b"host", b"test")], "client": ("test", 1), "server": ("test", 80),
+        }
+
+        started = time.monotonic()
+        request = asyncio.create_task(app(scope, receive, send))
+        await asyncio.sleep(0.5)
+        assert await _running_sleeps() == 1
+
+        disconnected.set()
+        await asyncio.wait_for(request, timeout=2)
+        elapsed = time.monotonic() - started
+
+        # Postgres tarda un instante en procesar la cancelación
+        await asyncio.sleep(0.2)
+        return sent, elapsed, await _running_sleeps()
+
+    sent, elapsed, running = run(scenario())
+
+    assert sent[0]["status"] == 499
+    assert elapsed < 2
+    assert running == 0
+
+
+def test_request_id_is_echoed_in_the_response():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            given = await client.get("/docs", headers={"X-Request-ID": "abc123"})
+            generated = await client.get("/docs")
+        return given, generated
+
+    given, generated = run(scenario())
+
+    assert given.headers["X-Request-ID"] == "abc123"
+    assert len(generated.headers["X-Request-ID"]) == 32
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import text
+
+from config import settings
+from config.db import async_engine
+from repositories.queries_repository import QueryTimeoutError, read_paginated, timed_session
+from tests.conftest import run
+
+
+@pytest.fixture
+def timed_table(sql):
+    sql(
+        "DROP TABLE IF EXISTS timed_test_items",
+        "CREATE TABLE timed_test_items (id serial PRIMARY KEY, name text)",
+        "INSERT INTO timed_test_items (name) VALUES ('a'), ('b')",
+    )
+    yield "timed_test_items"
+    sql("DROP TABLE IF EXISTS timed_test_items")
+
+
+def _set_configs(statements):
+    return [statement for statement in statements if "set_config" in statement]
+
+
+def test_single_statement_sets_both_timeouts_once(timed_table, statements):
+    async def scenario():
+        async with timed_session("read") as session:
+            await session.execute(text(f"SELECT * FROM {timed_table}"))
+
+    run(scenario())
+
+    set_configs = _set_configs(statements)
+    assert len(set_configs) == 1
+    assert "statement_timeout" in set_configs[0] and "lock_timeout" in set_configs[0]
+
+
+def test_later_statements_only_refresh_statement_timeout(timed_table, statements):
+    result = run(read_paginated(timed_table, {}))
+
+    assert result["metadata"]["total_registros"] == 2
+    # Conteo y datos: la primera sentencia va cubierta por el inicio de la transacción
+    set_configs = _set_configs(statements)
+    assert len(set_configs) == 2
+    assert "lock_timeout" not in set_configs[1]
+
+
+def test_lock_timeout_reports_the_lock_limit(timed_table, monkeypatch):
+    monkeypatch.setattr(settings, "DB_LOCK_TIMEOUT", 0.2)
+
+    async def scenario():
+        async with async_engine.connect() as holder:
+            await holder.execute(text(f"LOCK TABLE {timed_table} IN ACCESS EXCLUSIVE MODE"))
+            async with timed_session("read", timeout=5) as session:
+                await session.execute(text(f"SELECT * FROM {timed_table}"))
+
+    with pytest.raises(QueryTimeoutError) as error:
+        run(scenario())
+
+    assert "lock_timeout" in str(error.value)
+    assert "0.2s" in str(error.value)
+
+
+def test_statement_timeout_reports_the_deadline(timed_table):
+    async def scenario():
+        async with timed_session("read", timeout=0.2) as session:
+            await session.execute(text("SELECT pg_sleep(2)"))
+
+    with pytest.raises(QueryTimeoutError) as error:
+        run(scenario())
+
+    assert "statement_timeout" in str(error.value)
+    assert "0.2s" in str(error.value)
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from repositories.write_buffer import CreateBuffer
+from tests.conftest import run
+
+
+@pytest.fixture
+def buffer_table(sql):
+    sql(
+        "DROP TABLE IF EXISTS buffer_test_events",
+        "CREATE TABLE buffer_test_events (id serial PRIMARY KEY, kind text NOT NULL, n int UNIQUE, payload jsonb)",
+    )
+    yield "buffer_test_events"
+    sql("DROP TABLE IF EXISTS buffer_test_events")
+
+
+def test_flush_sends_one_insert_per_batch(buffer_table, statements):
+    async def scenario():
+        buffer = CreateBuffer(max_batch_size=20, max_delay=1)
+        records = await asyncio.gather(*[
+            buffer.create(buffer_table, {"kind": f"k{i}", "n": i, "payload": {"i": i}})
+            for i in range(20)
+        ])
+        await buffer.close()
+        return records
+
+    records = run(scenario())
+
+    inserts = [statement for statement in statements if "INSERT INTO" in statement]
+    assert len(inserts) == 1
+    # Cada llamador recibe su propio registro
+    assert [(r["kind"], r["n"], r["payload"]) for r in records] == [(f"k{i}", i, {"i": i}) for i in range(20)]
+    assert len({r["id"] for r in records}) == 20
+
+
+def test_invalid_row_fails_only_its_caller(buffer_table):
+    async def scenario():
+        buffer = CreateBuffer(max_batch_size=3, max_delay=1)
+        results = await asyncio.gather(
+            buffer.create(buffer_table, {"kind": "a", "n": 1}),
+            buffer.create(buffer_table, {"kind": "b", "n": 1}),
+            buffer.create(buffer_table, {"kind": "c", "n": 2}),
+            return_exceptions=True,
+        )
+        await buffer.close()
+        return results
+
+    first, duplicate, third = run(scenario())
+
+    assert first["kind"] == "a"
+    assert isinstance(duplicate, Exception)
+    assert third["kind"] == "c"
+
+
+def test_close_rejects_callers_waiting_for_a_slot(buffer_table):
+    async def scenario():
+        buffer = CreateBuffer(max_batch_size=10, max_delay=0.2, max_pending=1)
+        first = asyncio.create_task(buffer.create(buffer_table, {"kind": "a"}))
+        waiting = asyncio.create_task(buffer.create(buffer_table, {"kind": "b"}))
+        await asyncio.sleep(0)
+
+        await buffer.close()
+        pending_after_close = dict(buffer._pending)
+
+        return await first, await asyncio.gather(waiting, return_exceptions=True), pending_after_close
+
+    first, (waiting,), pending_after_close = run(scenario())
+
+    assert first["kind"] == "a"
+    assert isinstance(waiting, RuntimeError)
+    assert pending_after_close == {}
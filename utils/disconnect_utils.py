@@ -0,0 +1,27 @@
+import asyncio
+from fastapi import HTTPException, Request
+from typing import Awaitable, TypeVar
+
+
+T = TypeVar("T")
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Espera el resultado de `awaitable` y lo cancela si el cliente cierra la conexión,
+    para que una consulta abandonada no siga ocupando la base de datos ni el pool.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                # 499: código no estándar (nginx) para "el cliente cerró la petición"
+                raise HTTPException(status_code=499, detail="El cliente cerró la conexión")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,59 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from repositories.queries_repository import paginated_etag, read_paginated
+from utils.disconnect_utils import cancel_on_disconnect
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # La cabecera puede traer varios ETags y, según el cliente, con prefijo débil "W/"
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+
+async def paginated_response(
+    request: Request,
+    table_name: str,
+    filters: dict,
+    page: int = 1,
+    limit: int = 20,
+    operator: str = 'and',
+    order_by_column: str = 'id',
+    order_direction: str = 'asc',
+    timeout: Optional[float] = None
+) -> Response:
+    """
+    Responde con read_paginated y su ETag, o con 304 sin ejecutar las consultas de
+    conteo y datos si el cliente ya tiene la versión actual (If-None-Match).
+    """
+    etag = await paginated_etag(table_name, filters, page, limit, operator, order_by_column, order_direction)
+
+    headers = {}
+    if etag is not None:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    result = await cancel_on_disconnect(
+        request,
+        read_paginated(table_name, filters, page, limit, operator, order_by_column, order_direction, timeout)
+    )
+    result["datos"] = [dict(row) for row in result["datos"]]
+
+    return JSONResponse(content=jsonable_encoder(result), headers=headers)